@@ -3,42 +3,119 @@
 # Run: streamlit run app.py
 
 import io
+import os
 import re
 import math
 import time
+import uuid
+import atexit
+import tempfile
 import warnings
 from typing import List, Tuple, Optional
 
 import numpy as np
+import torch
 import streamlit as st
-import matplotlib.pyplot as plt
 from sentence_transformers import SentenceTransformer
-from keybert import KeyBERT
-from sklearn.decomposition import PCA
+
+# matplotlib and sklearn are imported lazily inside the functions that need
+# them: backend init and the scipy import chain cost a few hundred ms on cold
+# start, before the user has anything to plot.
 
 warnings.filterwarnings("ignore", category=UserWarning)
+torch.set_num_threads(os.cpu_count() or 1)
+
+
+def _plt():
+    """Lazy pyplot import pinned to the headless Agg backend (no GUI backend probing)."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+try:  # optional: ONNX Runtime accelerates CPU inference (fused kernels, int8)
+    import onnxruntime  # noqa: F401
+
+    _HAS_ONNX = True
+except ImportError:
+    _HAS_ONNX = False
+
+try:  # optional: numba compiles the small numeric kernels below to native code
+    from numba import njit
+
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+
+def _pick_device() -> str:
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
 
 
 # -----------------------------
 # Utilities
 # -----------------------------
+_RE_PUNCT = re.compile(r"[^\w\s]")
+_RE_WS = re.compile(r"\s+")
+
+
 def preprocess(text: str, lower: bool, strip_punct: bool) -> str:
     if lower:
         text = text.lower()
     if strip_punct:
-        text = re.sub(r"[^\w\s]", " ", text)
-        text = re.sub(r"\s+", " ", text).strip()
+        text = _RE_PUNCT.sub(" ", text)
+        text = _RE_WS.sub(" ", text).strip()
     return text
 
 
 def _unit(v: np.ndarray) -> np.ndarray:
-    n = np.linalg.norm(v)
-    return v if n == 0 else v / n
+    # np.vdot avoids the dispatch/validation overhead of np.linalg.norm on tiny vectors
+    n2 = float(np.vdot(v, v))
+    return v if n2 == 0 else v * (1.0 / math.sqrt(n2))
+
+
+if _HAS_NUMBA:
+
+    @njit(cache=True, fastmath=True)
+    def _euclid_sim_jit(v1: np.ndarray, v2: np.ndarray) -> float:
+        s = 0.0
+        for i in range(v1.shape[0]):
+            d = float(v1[i]) - float(v2[i])
+            s += d * d
+        return 1.0 / (1.0 + math.sqrt(s))
+
+    @njit(cache=True, fastmath=True)
+    def _contrib_topk_jit(v1: np.ndarray, v2: np.ndarray, topn: int):
+        # single compiled pass: elementwise products, repeated max-pick of the
+        # topn magnitudes (O(N*topn), all in L1), then order by signed value
+        c = v1 * v2
+        a = np.abs(c)
+        idx = np.empty(topn, np.int64)
+        for j in range(topn):
+            best = 0
+            for i in range(a.shape[0]):
+                if a[i] > a[best]:
+                    best = i
+            idx[j] = best
+            a[best] = -1.0
+        vals = c[idx]
+        order = np.argsort(vals)
+        return idx[order], vals[order]
 
 
 def euclidean_to_similarity(v1: np.ndarray, v2: np.ndarray) -> float:
-    dist = float(np.linalg.norm(v1 - v2))
-    return 1.0 / (1.0 + dist)
+    if _HAS_NUMBA:
+        return float(_euclid_sim_jit(v1, v2))
+    diff = v1 - v2
+    d2 = float(np.vdot(diff, diff))
+    return 1.0 / (1.0 + math.sqrt(d2))
 
 
 def compute_similarity(
@@ -58,52 +135,115 @@ def compute_similarity(
         raise ValueError("Unknown metric")
 
 
-def extract_keywords_kwbert(
-    kw_model: KeyBERT, text: str, top_k: int, ngram_min: int, ngram_max: int
+def _mmr_select_torch(
+    doc_sims: np.ndarray, cand_embs: np.ndarray, top_k: int, diversity: float, device: str
+) -> List[int]:
+    """MMR on GPU/MPS: every step is one GEMV plus elementwise ops, no host round-trips."""
+    sims = torch.from_numpy(doc_sims).to(device)
+    cands = torch.from_numpy(cand_embs).to(device)
+    top_k = min(top_k, sims.numel())
+
+    selected = [int(sims.argmax())]
+    taken = torch.zeros_like(sims, dtype=torch.bool)
+    taken[selected[0]] = True
+    redundancy = cands @ cands[selected[0]]  # running max-sim to the selected set
+    for _ in range(top_k - 1):
+        score = (1.0 - diversity) * sims - diversity * redundancy
+        score[taken] = float("-inf")
+        best = int(score.argmax())
+        selected.append(best)
+        taken[best] = True
+        redundancy = torch.maximum(redundancy, cands @ cands[best])
+    return selected
+
+
+def _mmr_select(
+    doc_sims: np.ndarray, cand_embs: np.ndarray, top_k: int, diversity: float = 0.5
+) -> List[int]:
+    """Maximal Marginal Relevance over unit candidate embeddings, vectorized in NumPy."""
+    device = _pick_device()
+    if device != "cpu":
+        return _mmr_select_torch(doc_sims, cand_embs, top_k, diversity, device)
+
+    top_k = min(top_k, len(doc_sims))
+    selected = [int(np.argmax(doc_sims))]
+    rest = [i for i in range(len(doc_sims)) if i != selected[0]]
+    while rest and len(selected) < top_k:
+        redundancy = (cand_embs[rest] @ cand_embs[selected].T).max(axis=1)
+        mmr = (1.0 - diversity) * doc_sims[rest] - diversity * redundancy
+        best = rest[int(np.argmax(mmr))]
+        selected.append(best)
+        rest.remove(best)
+    return selected
+
+
+def extract_keywords(
+    embedder: SentenceTransformer, text: str, top_k: int, ngram_min: int, ngram_max: int
 ) -> List[Tuple[str, float]]:
-    # Returns list of (phrase, score); higher score = more relevant
-    candidates = kw_model.extract_keywords(
-        text,
-        keyphrase_ngram_range=(ngram_min, ngram_max),
-        stop_words="english",
-        use_maxsum=False,
-        use_mmr=True,  # a bit more diverse
-        diversity=0.5,
-        top_n=top_k,
-    )
-    return candidates
-
+    # Returns list of (phrase, score); higher score = more relevant.
+    # Candidates are embedded together with the document in one batched forward
+    # pass, then MMR (diversity=0.5, as KeyBERT used to run) picks top_k.
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    try:
+        vec = CountVectorizer(ngram_range=(ngram_min, ngram_max), stop_words="english").fit([text])
+    except ValueError:  # nothing survives the stop-word filter
+        return []
+    candidates = list(vec.get_feature_names_out())
+
+    embs = embedder.encode(
+        [text] + candidates, normalize_embeddings=True, batch_size=64, convert_to_numpy=True
+    ).astype(np.float32)
+    doc_emb, cand_embs = embs[0], embs[1:]
+    doc_sims = cand_embs @ doc_emb
+
+    selected = _mmr_select(doc_sims, cand_embs, top_k)
+    selected.sort(key=lambda i: float(doc_sims[i]), reverse=True)
+    return [(candidates[i], float(doc_sims[i])) for i in selected]
+
+
+def fig_to_png_bytes(fig, dpi=90, close=True) -> bytes:
+    """Convert a Matplotlib figure to PNG bytes and close the figure to free memory.
+
+    dpi=90 is plenty for the 200-300px thumbnails; fewer pixels means a faster
+    PNG encode and fewer bytes over the wire. Pass close=False to save the
+    same figure again at another dpi (e.g. a full-size render) first.
+    """
+    plt = _plt()
 
-def fig_to_png_bytes(fig, dpi=150) -> bytes:
-    """Convert a Matplotlib figure to PNG bytes and close the figure to free memory."""
     buf = io.BytesIO()
     fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
-    plt.close(fig)
+    if close:
+        plt.close(fig)
     buf.seek(0)
     return buf.getvalue()
 
 
 # Unified thumbnail + expander renderer for consistent UX
 def show_thumb_with_expander(
-    png_bytes: bytes, caption: str, filename: str, thumb_width: int = None
+    png_bytes: bytes, caption: str, filename: str, thumb_width: int = None, full_png_bytes=None
 ):
     """
     Renders a thumbnail (container width by default) and provides
-    a 'View full size' expander with a download button.
+    a 'View full size' expander with a download button. The expander and
+    download serve full_png_bytes (a higher-dpi render) when provided.
     """
     if thumb_width is None:
         st.image(png_bytes, caption=caption, use_container_width=True)
     else:
         st.image(png_bytes, caption=caption, width=thumb_width)
+    full = full_png_bytes if full_png_bytes is not None else png_bytes
     with st.expander("View full size"):
-        st.image(png_bytes)
-        st.download_button("Download PNG", data=png_bytes, file_name=filename, mime="image/png")
+        st.image(full)
+        st.download_button("Download PNG", data=full, file_name=filename, mime="image/png")
 
 
 # -----------------------------
 # Plotting (return figures; caller decides how to render)
 # -----------------------------
 def plot_polar(v1: np.ndarray, v2: np.ndarray, title: str):
+    plt = _plt()
+
     # Normalize and compute angle
     v1 = _unit(v1)
     v2 = _unit(v2)
@@ -128,12 +268,18 @@ def plot_polar(v1: np.ndarray, v2: np.ndarray, title: str):
 
 
 def top_contrib_bars(v1: np.ndarray, v2: np.ndarray, title: str, topn: int = 20):
+    plt = _plt()
+
     v1 = _unit(v1)
     v2 = _unit(v2)
-    contrib = v1 * v2  # elementwise product; positives help cosine, negatives oppose
-    idx = np.argsort(np.abs(contrib))[-topn:]
-    idx = idx[np.argsort(contrib[idx])]  # sorted so negatives first
-    vals = contrib[idx]
+    if _HAS_NUMBA:
+        idx, vals = _contrib_topk_jit(v1, v2, topn)
+    else:
+        contrib = v1 * v2  # elementwise product; positives help cosine, negatives oppose
+        abs_c = np.abs(contrib)
+        idx = np.argpartition(abs_c, -topn)[-topn:]  # O(N) top-k instead of a full sort
+        idx = idx[np.argsort(contrib[idx])]  # sorted so negatives first
+        vals = contrib[idx]
 
     fig, ax = plt.subplots(figsize=(3.6, 3.0))
     ax.bar(range(len(vals)), vals)
@@ -143,38 +289,148 @@ def top_contrib_bars(v1: np.ndarray, v2: np.ndarray, title: str, topn: int = 20)
     return fig
 
 
+@st.cache_data(show_spinner=False, max_entries=32)
+def make_polar_png(v1_bytes: bytes, v2_bytes: bytes, title: str) -> Tuple[bytes, bytes]:
+    """Render the polar plot to (thumbnail, full-size) PNGs, content-addressed on vector bytes.
+
+    Matplotlib rasterization dominates the render path after encode; a rerun
+    with unchanged vectors (e.g. a threshold-slider move) reuses both blobs.
+    The figure is built once and saved at thumbnail dpi for the inline view
+    and at the original dpi=150 for the expander/download.
+    """
+    v1 = np.frombuffer(v1_bytes, dtype=np.float32)
+    v2 = np.frombuffer(v2_bytes, dtype=np.float32)
+    fig = plot_polar(v1, v2, title)
+    thumb = fig_to_png_bytes(fig, close=False)
+    return thumb, fig_to_png_bytes(fig, dpi=150)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def make_contrib_png(
+    v1_bytes: bytes, v2_bytes: bytes, title: str, topn: int = 20
+) -> Tuple[bytes, bytes]:
+    v1 = np.frombuffer(v1_bytes, dtype=np.float32)
+    v2 = np.frombuffer(v2_bytes, dtype=np.float32)
+    fig = top_contrib_bars(v1, v2, title, topn=topn)
+    thumb = fig_to_png_bytes(fig, close=False)
+    return thumb, fig_to_png_bytes(fig, dpi=150)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _pca_project(points_bytes: bytes, n_rows: int, dim: int):
+    """Fit a 2-component PCA on packed float32 points; content-addressed so reruns skip the fit.
+
+    Randomized SVD is O(n*d*k) vs the full solver's O(n*d*min(n, d)) — plenty
+    for a 2D map of a few hundred vectors.
+    """
+    from sklearn.decomposition import PCA
+
+    # copy() because frombuffer memory is read-only; normalization then works
+    # in-place on that one buffer instead of allocating a second (N, d) array
+    X = np.frombuffer(points_bytes, dtype=np.float32).reshape(n_rows, dim).copy()
+    norms = np.sqrt(np.einsum("ij,ij->i", X, X))
+    norms += 1e-12
+    X /= norms[:, None]
+    pca = PCA(n_components=2, svd_solver="randomized", random_state=0)
+    XY = pca.fit_transform(X)
+    return XY, pca.components_, pca.mean_
+
+
+# -----------------------------
+# History vector store (disk-backed)
+# -----------------------------
+_HIST_ROWS = 5000  # vector capacity; ~7.5 MB on disk at d=768 float16
+
+
+def _unlink_quiet(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:  # e.g. still mapped during teardown; tempdir cleanup gets it
+        pass
+
+
+def _history_store(dim: int) -> np.ndarray:
+    """Per-session float16 memmap that backs the history embeddings.
+
+    History entries keep integer row indices instead of arrays, so the OS
+    pages vectors in only when the PCA map reads them and session state holds
+    no per-entry numpy objects.
+    """
+    store = st.session_state.get("hist_mmap")
+    if store is None or store.shape[1] != dim:
+        if store is not None:
+            # model switch changed the embedding dim; mixed dims can't share
+            # a projection, so restart the store and drop the stale entries
+            st.session_state.history = []
+        path = os.path.join(tempfile.gettempdir(), f"embedcompare-hist-{uuid.uuid4().hex}.f16")
+        store = np.memmap(path, dtype=np.float16, mode="w+", shape=(_HIST_ROWS, dim))
+        if os.name == "posix":
+            # unlink immediately: POSIX keeps the mapping usable and the kernel
+            # reclaims the space when the session's mapping goes away, so files
+            # never pile up in the tempdir on long-running hosts
+            os.unlink(path)
+        else:
+            # Windows refuses to delete a file with an active mapping, so
+            # defer cleanup to interpreter exit instead
+            atexit.register(_unlink_quiet, path)
+        st.session_state.hist_mmap = store
+        st.session_state.hist_next_row = 0
+    return store
+
+
+def _history_append(vectors: List[np.ndarray]) -> List[int]:
+    """Write vectors into the next free store rows (wrapping at capacity); return row indices."""
+    store = _history_store(len(vectors[0]))
+    nxt = st.session_state.hist_next_row
+    rows = []
+    for v in vectors:
+        r = nxt % _HIST_ROWS
+        store[r] = v.astype(np.float16)
+        rows.append(r)
+        nxt += 1
+    st.session_state.hist_next_row = nxt
+    return rows
+
+
 def pca_history_plot_return_fig(history: List[dict]):
+    plt = _plt()
+
     st.markdown("### 🗺️ History Map (PCA → 2D)")
-    points = []
+    rows = []
     labels = []  # tuples like ("scraped"|"query"|"scraped_kw"|"query_kw", timestamp)
 
     for h in history:
-        if h.get("v_scraped") is None or h.get("v_query") is None:
+        if h.get("row_scraped") is None or h.get("row_query") is None:
             continue
-        points.append(h["v_scraped"])
+        rows.append(h["row_scraped"])
         labels.append(("scraped", h["time"]))
-        points.append(h["v_query"])
+        rows.append(h["row_query"])
         labels.append(("query", h["time"]))
-        if h.get("v_scraped_kw") is not None and h.get("v_query_kw") is not None:
-            points.append(h["v_scraped_kw"])
+        if h.get("row_scraped_kw") is not None and h.get("row_query_kw") is not None:
+            rows.append(h["row_scraped_kw"])
             labels.append(("scraped_kw", h["time"]))
-            points.append(h["v_query_kw"])
+            rows.append(h["row_query_kw"])
             labels.append(("query_kw", h["time"]))
 
-    if len(points) < 3:
+    store = st.session_state.get("hist_mmap")
+    if store is None or len(rows) < 3:
         st.info("Add a few runs to populate the history map.")
         return None
 
-    X = np.vstack(points).astype(np.float32)
-    X = X / (np.linalg.norm(X, axis=1, keepdims=True) + 1e-12)
-    pca = PCA(n_components=2, random_state=0)
-    XY = pca.fit_transform(X)
+    # fancy indexing pulls the selected rows off disk into one contiguous slab
+    X = np.asarray(store[np.asarray(rows)], dtype=np.float32)
+    XY, components, mean = _pca_project(X.tobytes(), X.shape[0], X.shape[1])
 
     fig, ax = plt.subplots(figsize=(4.0, 4.0))  # smaller thumbnail-friendly base size
     kinds = {"scraped": "o", "query": "^", "scraped_kw": "s", "query_kw": "D"}
 
-    for (kind, _t), (x, y) in zip(labels, XY):
-        ax.scatter(x, y, marker=kinds.get(kind, "o"), alpha=0.85)
+    # One vectorized scatter per marker kind instead of one PathCollection per point
+    idx_by_kind: dict = {}
+    for i, (kind, _t) in enumerate(labels):
+        idx_by_kind.setdefault(kind, []).append(i)
+    for kind, idxs in idx_by_kind.items():
+        pts = XY[idxs]
+        ax.scatter(pts[:, 0], pts[:, 1], marker=kinds.get(kind, "o"), alpha=0.85, label=kind)
 
     ax.set_title("Recent vectors projected to 2D (PCA)", fontsize=10)
     ax.set_xlabel("PC1")
@@ -182,11 +438,11 @@ def pca_history_plot_return_fig(history: List[dict]):
 
     # Highlight latest pair(s) with a ring
     latest = history[0]
-    latest_pts = [latest["v_scraped"], latest["v_query"]]
-    if latest.get("v_scraped_kw") is not None and latest.get("v_query_kw") is not None:
-        latest_pts += [latest["v_scraped_kw"], latest["v_query_kw"]]
-    latest_pts = np.vstack(latest_pts)
-    latest_xy = pca.transform(latest_pts)
+    latest_rows = [latest["row_scraped"], latest["row_query"]]
+    if latest.get("row_scraped_kw") is not None and latest.get("row_query_kw") is not None:
+        latest_rows += [latest["row_scraped_kw"], latest["row_query_kw"]]
+    latest_pts = np.asarray(store[np.asarray(latest_rows)], dtype=np.float32)
+    latest_xy = (latest_pts - mean) @ components.T
     ax.scatter(
         latest_xy[:, 0], latest_xy[:, 1], edgecolor="k", s=160, facecolor="none", linewidth=1.2
     )
@@ -218,6 +474,15 @@ with st.sidebar:
         ],
         index=0,
     )
+    use_fp16 = st.checkbox(
+        "FP16 inference",
+        value=_pick_device() != "cpu",
+        help="Half-precision weights on GPU/MPS. Ignored on CPU, where FP16 is slower.",
+    )
+    # normalize before the flag reaches any cache key: on CPU the flag is a
+    # no-op, and letting it vary would duplicate the cached model and cold-
+    # invalidate the embedding/keyword caches for no behavioral difference
+    use_fp16 = use_fp16 and _pick_device() != "cpu"
     metric = st.selectbox(
         "Similarity metric", ["Cosine", "Dot product", "Euclidean→similarity"], index=0
     )
@@ -226,7 +491,7 @@ with st.sidebar:
     do_lower = st.checkbox("lowercase", value=True)
     do_strip = st.checkbox("strip punctuation", value=False)
 
-    st.subheader("Keyword Extraction (KeyBERT)")
+    st.subheader("Keyword Extraction")
     enable_kw = st.checkbox("Enable keyword extraction", value=True)
     top_k = st.slider("Top K keywords", min_value=3, max_value=20, value=8, step=1)
     ngram_min, ngram_max = st.select_slider(
@@ -261,10 +526,46 @@ run = st.button("Compute similarity", type="primary")
 # Engine load (lazy & cached)
 # -----------------------------
 @st.cache_resource(show_spinner=False)
-def load_models(selected_model: str):
-    embedder = SentenceTransformer(selected_model)
-    kw_model = KeyBERT(model=embedder)  # share the same SBERT under the hood
-    return embedder, kw_model
+def load_models(selected_model: str, use_fp16: bool = False):
+    device = _pick_device()
+    if device == "cpu" and _HAS_ONNX:
+        # ONNX Runtime fuses LayerNorm/GeLU and dominates the torch CPU path;
+        # sentence-transformers exports and caches the graph on first load.
+        try:
+            embedder = SentenceTransformer(selected_model, device="cpu", backend="onnx")
+        except Exception:
+            embedder = SentenceTransformer(selected_model, device="cpu")
+    else:
+        embedder = SentenceTransformer(selected_model, device=device)
+        if use_fp16 and device != "cpu":
+            embedder = embedder.half()  # FP16 on CPU is slower, so gate on device
+    return embedder
+
+
+@st.cache_data(show_spinner=False, max_entries=512)
+def encode_cached(model_name: str, texts: Tuple[str, ...], use_fp16: bool = False) -> np.ndarray:
+    """Embed a batch of texts in one forward pass, memoized on (model, texts).
+
+    Batching lets SentenceTransformers tokenize/pad once and run a single
+    model forward instead of one per text; memoization means slider/toggle
+    reruns skip the forward pass entirely. Given a list, SBERT sorts inputs
+    by token length, pads per batch, and restores the original order — so
+    multi-sentence inputs (e.g. a pasted paragraph split by line) batch
+    efficiently without any sorting on our side.
+    """
+    embedder = load_models(model_name, use_fp16)
+    embs = embedder.encode(
+        list(texts), normalize_embeddings=True, batch_size=32, convert_to_numpy=True
+    )
+    return embs.astype(np.float32)
+
+
+@st.cache_data(show_spinner=False, max_entries=512)
+def extract_keywords_cached(
+    model_name: str, text: str, top_k: int, ngram_min: int, ngram_max: int, use_fp16: bool = False
+) -> List[Tuple[str, float]]:
+    embedder = load_models(model_name, use_fp16)
+    return extract_keywords(embedder, text, top_k, ngram_min, ngram_max)
 
 
 # -----------------------------
@@ -275,38 +576,53 @@ if run:
         st.warning("Please enter both sentences.")
     else:
         with st.spinner("Computing…"):
-            embedder, kwbert = load_models(model_name)
-
             # Preprocess
             p_scraped = preprocess(scraped, do_lower, do_strip)
             p_query = preprocess(query, do_lower, do_strip)
 
-            # Embeddings for full sentences (normalize=True yields unit vectors)
-            v_scraped = embedder.encode(p_scraped, normalize_embeddings=True)
-            v_query = embedder.encode(p_query, normalize_embeddings=True)
-
-            full_sim = compute_similarity(v_scraped, v_query, metric, already_unit=True)
-
-            # Keyword extraction (optional)
+            # Keyword extraction (optional) — done first so all texts embed in one batch
             kw_scraped = []
             kw_query = []
             kw_sim: Optional[float] = None
             v_scraped_kw = None
             v_query_kw = None
 
+            texts = [p_scraped, p_query]
             if enable_kw:
-                kw_scraped = extract_keywords_kwbert(kwbert, p_scraped, top_k, ngram_min, ngram_max)
-                kw_query = extract_keywords_kwbert(kwbert, p_query, top_k, ngram_min, ngram_max)
+                kw_scraped = extract_keywords_cached(
+                    model_name, p_scraped, top_k, ngram_min, ngram_max, use_fp16
+                )
+                kw_query = extract_keywords_cached(
+                    model_name, p_query, top_k, ngram_min, ngram_max, use_fp16
+                )
 
-                # Build keyword-only “summaries” to re-embed
+                # Build keyword-only “summaries” to re-embed; an empty summary
+                # reuses the full-sentence embedding instead of re-encoding it
                 text_kw_scraped = " ; ".join([k for k, s in kw_scraped])
                 text_kw_query = " ; ".join([k for k, s in kw_query])
+                if text_kw_scraped:
+                    texts.append(text_kw_scraped)
+                if text_kw_query:
+                    texts.append(text_kw_query)
 
-                v_scraped_kw = embedder.encode(
-                    text_kw_scraped or p_scraped, normalize_embeddings=True
-                )
-                v_query_kw = embedder.encode(text_kw_query or p_query, normalize_embeddings=True)
-                kw_sim = compute_similarity(v_scraped_kw, v_query_kw, metric, already_unit=True)
+            # One batched forward pass for all sentences (normalize=True yields unit vectors)
+            embs = encode_cached(model_name, tuple(texts), use_fp16)
+            v_scraped, v_query = embs[0], embs[1]
+
+            full_sim = compute_similarity(v_scraped, v_query, metric, already_unit=True)
+
+            if enable_kw:
+                i = 2
+                if text_kw_scraped:
+                    v_scraped_kw = embs[i]
+                    i += 1
+                else:
+                    v_scraped_kw = v_scraped
+                v_query_kw = embs[i] if text_kw_query else v_query
+                if not text_kw_scraped and not text_kw_query:
+                    kw_sim = full_sim
+                else:
+                    kw_sim = compute_similarity(v_scraped_kw, v_query_kw, metric, already_unit=True)
 
             # save "last" result for persistent display
             st.session_state.last = {
@@ -327,7 +643,12 @@ if run:
                 "v_query_kw": None if v_query_kw is None else v_query_kw.astype(np.float32),
             }
 
-            # update history
+            # update history — embeddings go to the disk-backed store, entries keep row indices
+            hist_vecs = [v_scraped, v_query]
+            if v_scraped_kw is not None and v_query_kw is not None:
+                hist_vecs += [v_scraped_kw, v_query_kw]
+            hist_rows = _history_append(hist_vecs)
+
             st.session_state.history.insert(
                 0,
                 {
@@ -338,10 +659,10 @@ if run:
                     "query": query,
                     "full_sim": full_sim,
                     "kw_sim": kw_sim,
-                    "v_scraped": st.session_state.last["v_scraped"],
-                    "v_query": st.session_state.last["v_query"],
-                    "v_scraped_kw": st.session_state.last["v_scraped_kw"],
-                    "v_query_kw": st.session_state.last["v_query_kw"],
+                    "row_scraped": hist_rows[0],
+                    "row_query": hist_rows[1],
+                    "row_scraped_kw": hist_rows[2] if len(hist_rows) == 4 else None,
+                    "row_query_kw": hist_rows[3] if len(hist_rows) == 4 else None,
                 },
             )
             st.session_state.history = st.session_state.history[:50]
@@ -398,7 +719,7 @@ if last is not None:
         st.code(last["p_query"], language="text")
 
     if last["kw_scraped"] or last["kw_query"]:
-        st.markdown("#### Extracted Keywords (KeyBERT)")
+        st.markdown("#### Extracted Keywords")
         c1, c2 = st.columns(2)
         with c1:
             st.write("**Scraped sentence keywords**")
@@ -416,24 +737,29 @@ if last is not None:
     colA, colB = st.columns(2)  # just two columns now
 
     # Polar (full sentence)
-    fig_polar_full = plot_polar(last["v_scraped"], last["v_query"], "Full-sentence vectors")
-    png_polar_full = fig_to_png_bytes(fig_polar_full)
+    png_polar_full, png_polar_full_hi = make_polar_png(
+        last["v_scraped"].tobytes(), last["v_query"].tobytes(), "Full-sentence vectors"
+    )
     with colA:
         show_thumb_with_expander(
-            png_polar_full, "Polar (full sentence)", "polar_full.png", thumb_width=200
+            png_polar_full,
+            "Polar (full sentence)",
+            "polar_full.png",
+            thumb_width=200,
+            full_png_bytes=png_polar_full_hi,
         )
 
     # Contributions (full sentence)
-    fig_contrib_full = top_contrib_bars(
-        last["v_scraped"], last["v_query"], "Full-sentence", topn=20
+    png_contrib_full, png_contrib_full_hi = make_contrib_png(
+        last["v_scraped"].tobytes(), last["v_query"].tobytes(), "Full-sentence", topn=20
     )
-    png_contrib_full = fig_to_png_bytes(fig_contrib_full)
     with colB:
         show_thumb_with_expander(
             png_contrib_full,
             "Top contributions (full sentence)",
             "contrib_full.png",
             thumb_width=300,
+            full_png_bytes=png_contrib_full_hi,
         )
 
     # Optional: Keyword-only row
@@ -441,23 +767,28 @@ if last is not None:
         st.markdown("### Visuals (Keyword-only)")
         k1, k2 = st.columns(2)
 
-        fig_polar_kw = plot_polar(last["v_scraped_kw"], last["v_query_kw"], "Keyword-only vectors")
-        png_polar_kw = fig_to_png_bytes(fig_polar_kw)
+        png_polar_kw, png_polar_kw_hi = make_polar_png(
+            last["v_scraped_kw"].tobytes(), last["v_query_kw"].tobytes(), "Keyword-only vectors"
+        )
         with k1:
             show_thumb_with_expander(
-                png_polar_kw, "Polar (keyword-only)", "polar_keyword.png", thumb_width=200
+                png_polar_kw,
+                "Polar (keyword-only)",
+                "polar_keyword.png",
+                thumb_width=200,
+                full_png_bytes=png_polar_kw_hi,
             )
 
-        fig_contrib_kw = top_contrib_bars(
-            last["v_scraped_kw"], last["v_query_kw"], "Keyword-only", topn=20
+        png_contrib_kw, png_contrib_kw_hi = make_contrib_png(
+            last["v_scraped_kw"].tobytes(), last["v_query_kw"].tobytes(), "Keyword-only", topn=20
         )
-        png_contrib_kw = fig_to_png_bytes(fig_contrib_kw)
         with k2:
             show_thumb_with_expander(
                 png_contrib_kw,
                 "Top contributions (keyword-only)",
                 "contrib_keyword.png",
                 thumb_width=300,
+                full_png_bytes=png_contrib_kw_hi,
             )
 
 # -----------------------------
@@ -468,8 +799,15 @@ fig_pca = pca_history_plot_return_fig(st.session_state.history)
 if fig_pca is None:
     st.info("Run a few comparisons to populate the history map.")
 else:
-    png_pca = fig_to_png_bytes(fig_pca, dpi=200)
-    show_thumb_with_expander(png_pca, "History map (PCA)", "history_map.png", thumb_width=200)
+    png_pca = fig_to_png_bytes(fig_pca, dpi=120, close=False)
+    png_pca_hi = fig_to_png_bytes(fig_pca, dpi=200)
+    show_thumb_with_expander(
+        png_pca,
+        "History map (PCA)",
+        "history_map.png",
+        thumb_width=200,
+        full_png_bytes=png_pca_hi,
+    )
 
 # -----------------------------
 # History table